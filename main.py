@@ -1,11 +1,17 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 from pathlib import Path
 import unicodedata
+import functools
+import hashlib
 import io
+import os
+import tempfile
+import pyarrow as pa
 
 # -------------------------
 # 기본 설정
@@ -32,6 +38,8 @@ PLOTLY_FONT = dict(family="Malgun Gothic, Apple SD Gothic Neo, sans-serif")
 # -------------------------
 BASE_DIR = Path(__file__).parent
 DATA_DIR = BASE_DIR / "data"
+CACHE_DIR = DATA_DIR / ".cache"
+CACHE_VERSION = 3  # 로더가 반환하는 형태가 바뀌면 올릴 것
 
 EC_INFO = {
     "송도고": 1.0,
@@ -39,6 +47,19 @@ EC_INFO = {
     "아라고": 4.0,
     "동산고": 8.0
 }
+EC_METRIC_PANELS = {
+    "평균 생중량": "생중량",
+    "평균 잎 수": "잎수",
+    "평균 지상부 길이": "길이",
+    "개체수": "n"
+}
+SCHOOL_DTYPE = pd.CategoricalDtype(categories=list(EC_INFO.keys()), ordered=False)
+
+ENV_METRICS = ["temperature", "humidity", "ph", "ec"]
+TS_MAX_POINTS = 5000
+TS_RESAMPLE_FREQ = "1h"
+GROWTH_METRICS = ["잎 수(장)", "지상부 길이(mm)", "지하부길이(mm)", "생중량(g)"]
+GROWTH_COLUMNS = ["개체번호"] + GROWTH_METRICS
 
 # -------------------------
 # 유틸: NFC/NFD 안전 파일 찾기
@@ -46,29 +67,97 @@ EC_INFO = {
 def normalize(text):
     return unicodedata.normalize("NFC", text)
 
+@functools.lru_cache(maxsize=8)
+def _dir_index(directory: Path, mtime_ns: int):
+    # mtime_ns는 캐시 키 용도: 파일이 추가/삭제되면 목록을 다시 스캔
+    return {normalize(f.name): f for f in directory.iterdir()}
+
 def find_file_by_name(directory: Path, target_name: str):
-    target_norm = normalize(target_name)
-    for file in directory.iterdir():
-        if normalize(file.name) == target_norm:
-            return file
-    return None
+    index = _dir_index(directory, directory.stat().st_mtime_ns)
+    return index.get(normalize(target_name))
+
+# -------------------------
+# 유틸: Parquet 디스크 캐시
+# -------------------------
+def parquet_cache_path(name, sources):
+    # 로더 스키마와 모든 원본 파일의 (이름, mtime, 크기)로 캐시 키 생성
+    key = hashlib.sha1(repr((
+        CACHE_VERSION,
+        ENV_METRICS,
+        GROWTH_COLUMNS,
+        list(EC_INFO.items()),
+        sorted((f.name, f.stat().st_mtime_ns, f.stat().st_size) for f in sources)
+    )).encode("utf-8")).hexdigest()[:16]
+    return CACHE_DIR / f"{name}-{key}.parquet"
+
+def read_parquet_cache(path: Path):
+    if not path.exists():
+        return None
+    try:
+        return pd.read_parquet(path, engine="pyarrow")
+    except (pa.ArrowException, OSError):
+        # 손상되었거나 읽을 수 없는 캐시 파일은 지우고 원본을 다시 파싱
+        try:
+            path.unlink(missing_ok=True)
+        except OSError:
+            pass
+        return None
+
+def write_parquet_cache(df, path: Path):
+    tmp_path = None
+    try:
+        CACHE_DIR.mkdir(exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=CACHE_DIR, suffix=".tmp", delete=False) as tmp:
+            tmp_path = Path(tmp.name)
+        df.to_parquet(tmp_path, engine="pyarrow", compression="zstd")
+        # NamedTemporaryFile은 0600으로 생성되므로 다른 사용자도 읽을 수 있게 조정
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+        for old in CACHE_DIR.glob(f"{path.stem.rsplit('-', 1)[0]}-*.parquet"):
+            if old != path:
+                old.unlink(missing_ok=True)
+    except (pa.ArrowException, ValueError, OSError):
+        # 캐시 저장 실패는 로딩을 막지 않음
+        if tmp_path is not None:
+            try:
+                tmp_path.unlink(missing_ok=True)
+            except OSError:
+                pass
 
 # -------------------------
 # 데이터 로딩
 # -------------------------
 @st.cache_data
 def load_environment_data():
-    data = {}
+    frames = []
     with st.spinner("환경 데이터 로딩 중..."):
+        files = {}
         for school in EC_INFO.keys():
             filename = f"{school}_환경데이터.csv"
             file_path = find_file_by_name(DATA_DIR, filename)
             if file_path is None:
                 st.error(f"환경 데이터 파일을 찾을 수 없습니다: {filename}")
                 return None
-            df = pd.read_csv(file_path)
+            files[school] = file_path
+
+        cache_path = parquet_cache_path("environment", files.values())
+        data = read_parquet_cache(cache_path)
+        if data is not None:
+            return data
+
+        for school, file_path in files.items():
+            df = pd.read_csv(
+                file_path,
+                engine="pyarrow",
+                usecols=["time"] + ENV_METRICS
+            )
+            df["time"] = pd.to_datetime(df["time"])
+            df[ENV_METRICS] = df[ENV_METRICS].astype("float32")
             df["학교"] = school
-            data[school] = df
+            frames.append(df)
+    data = pd.concat(frames, ignore_index=True)
+    data["학교"] = data["학교"].astype(SCHOOL_DTYPE)
+    write_parquet_cache(data, cache_path)
     return data
 
 @st.cache_data
@@ -80,21 +169,150 @@ def load_growth_data():
             st.error("생육 결과 엑셀 파일을 찾을 수 없습니다.")
             return None
 
-        xls = pd.ExcelFile(file_path, engine="openpyxl")
-        data = {}
-        for sheet in xls.sheet_names:
-            df = pd.read_excel(xls, sheet_name=sheet)
-            df["학교"] = sheet
-            df["EC"] = EC_INFO.get(sheet, None)
-            data[sheet] = df
+        cache_path = parquet_cache_path("growth", [file_path])
+        data = read_parquet_cache(cache_path)
+        if data is not None:
+            return data
+
+        sheets = pd.read_excel(file_path, sheet_name=None, engine="calamine")
+        known = {normalize(sheet): df for sheet, df in sheets.items() if normalize(sheet) in EC_INFO}
+        unknown = [sheet for sheet in sheets if normalize(sheet) not in EC_INFO]
+        if not known:
+            st.error("생육 결과 엑셀 파일에 학교 시트가 없습니다.")
+            return None
+        data = pd.concat(
+            [
+                df.loc[:, GROWTH_COLUMNS].assign(학교=school, EC=EC_INFO[school])
+                for school, df in known.items()
+            ],
+            ignore_index=True
+        )
+        data["학교"] = data["학교"].astype(SCHOOL_DTYPE)
+        data["EC"] = data["EC"].astype("float32")
+        data.attrs["skipped_sheets"] = unknown
+        write_parquet_cache(data, cache_path)
         return data
 
-env_data = load_environment_data()
-growth_data = load_growth_data()
+# -------------------------
+# 집계 캐시
+# -------------------------
+@st.cache_data
+def ec_metric_means():
+    return (
+        load_growth_data()
+        .groupby("EC", observed=True, sort=False)
+        .agg(
+            생중량=("생중량(g)", "mean"),
+            잎수=("잎 수(장)", "mean"),
+            길이=("지상부 길이(mm)", "mean"),
+            n=("생중량(g)", "size")
+        )
+        .reindex(sorted(EC_INFO.values()))
+    )
+
+@st.cache_data
+def env_school_means():
+    return (
+        load_environment_data()
+        .groupby("학교", observed=True, sort=False)
+        .mean(numeric_only=True)
+        .reindex(EC_INFO.keys())
+        .reset_index()
+    )
+
+@st.cache_data
+def school_weight_quantiles():
+    return (
+        load_growth_data()
+        .groupby("학교", observed=True, sort=False)["생중량(g)"]
+        .quantile([0.0, 0.25, 0.5, 0.75, 1.0])
+        .unstack()
+        .reindex(EC_INFO.keys())
+    )
+
+@st.cache_data
+def env_by_school():
+    return {
+        s: g.reset_index(drop=True)
+        for s, g in load_environment_data().groupby("학교", observed=True, sort=False)
+    }
+
+@st.cache_data
+def env_timeseries(school):
+    df = env_by_school()[school]
+    if len(df) > TS_MAX_POINTS:
+        df = (
+            df.set_index("time")
+            .resample(TS_RESAMPLE_FREQ)
+            .mean(numeric_only=True)
+            .dropna()
+            .reset_index()
+        )
+    return df
+
+@st.cache_data
+def env_csv_bytes():
+    return load_environment_data().to_csv(index=False).encode("utf-8")
+
+@st.cache_data
+def growth_xlsx_bytes():
+    buffer = io.BytesIO()
+    load_growth_data().to_excel(buffer, index=False, engine="xlsxwriter")
+    return buffer.getvalue()
 
-if env_data is None or growth_data is None:
+# -------------------------
+# Figure 템플릿
+# -------------------------
+@st.cache_resource
+def env_mean_fig_template():
+    fig = make_subplots(
+        rows=2, cols=2,
+        subplot_titles=("평균 온도", "평균 습도", "평균 pH", "목표 EC vs 실측 EC")
+    )
+    fig.update_layout(height=700, font=PLOTLY_FONT)
+    fig.update_xaxes(type="category")
+    return fig
+
+@st.cache_resource
+def env_ts_fig_template():
+    fig = make_subplots(rows=3, cols=1, shared_xaxes=True,
+                        subplot_titles=("온도 변화", "습도 변화", "EC 변화"))
+    fig.update_layout(height=700, font=PLOTLY_FONT)
+    return fig
+
+@st.cache_resource
+def ec_metric_fig_template():
+    fig = make_subplots(rows=2, cols=2, subplot_titles=list(EC_METRIC_PANELS.keys()))
+    fig.update_layout(height=700, font=PLOTLY_FONT)
+    return fig
+
+@st.cache_data
+def tab1_summary():
+    env_all = load_environment_data()
+    growth_all = load_growth_data()
+    info_df = pd.DataFrame({
+        "학교": EC_INFO.keys(),
+        "EC 목표": EC_INFO.values(),
+        "개체수": growth_all["학교"].value_counts().reindex(EC_INFO.keys(), fill_value=0).values
+    })
+    return dict(
+        info_df=info_df,
+        total=info_df["개체수"].sum(),
+        avg_temp=env_all["temperature"].mean(),
+        avg_hum=env_all["humidity"].mean(),
+        best_ec=ec_metric_means()["생중량"].idxmax()
+    )
+
+env_all = load_environment_data()
+growth_all = load_growth_data()
+
+if env_all is None or growth_all is None:
     st.stop()
 
+skipped_sheets = growth_all.attrs.get("skipped_sheets")
+if skipped_sheets:
+    st.warning(f"EC 정보가 없는 시트는 제외했습니다: {', '.join(repr(sheet) for sheet in skipped_sheets)}")
+
 # -------------------------
 # 사이드바
 # -------------------------
@@ -123,30 +341,15 @@ with tab1:
         """
     )
 
-    info_df = pd.DataFrame({
-        "학교": EC_INFO.keys(),
-        "EC 목표": EC_INFO.values(),
-        "개체수": [len(growth_data[s]) for s in EC_INFO.keys()]
-    })
+    summary = tab1_summary()
     st.subheader("학교별 EC 조건")
-    st.dataframe(info_df, use_container_width=True)
-
-    total_plants = info_df["개체수"].sum()
-    avg_temp = pd.concat(env_data.values())["temperature"].mean()
-    avg_hum = pd.concat(env_data.values())["humidity"].mean()
-
-    growth_all = pd.concat(growth_data.values())
-    best_ec = (
-        growth_all.groupby("EC")["생중량(g)"]
-        .mean()
-        .idxmax()
-    )
+    st.dataframe(summary["info_df"], use_container_width=True)
 
     c1, c2, c3, c4 = st.columns(4)
-    c1.metric("총 개체수", f"{total_plants} 개")
-    c2.metric("평균 온도", f"{avg_temp:.1f} ℃")
-    c3.metric("평균 습도", f"{avg_hum:.1f} %")
-    c4.metric("최적 EC", f"{best_ec}")
+    c1.metric("총 개체수", f"{summary['total']} 개")
+    c2.metric("평균 온도", f"{summary['avg_temp']:.1f} ℃")
+    c3.metric("평균 습도", f"{summary['avg_hum']:.1f} %")
+    c4.metric("최적 EC", f"{summary['best_ec']}")
 
 # =========================================================
 # Tab 2: 환경 데이터
@@ -154,59 +357,50 @@ with tab1:
 with tab2:
     st.subheader("학교별 환경 평균 비교")
 
-    env_all = pd.concat(env_data.values())
-    env_mean = env_all.groupby("학교").mean(numeric_only=True).reset_index()
+    env_mean = env_school_means()
 
-    fig = make_subplots(
-        rows=2, cols=2,
-        subplot_titles=("평균 온도", "평균 습도", "평균 pH", "목표 EC vs 실측 EC")
-    )
+    fig = go.Figure(env_mean_fig_template())
 
-    fig.add_bar(x=env_mean["학교"], y=env_mean["temperature"], row=1, col=1)
-    fig.add_bar(x=env_mean["학교"], y=env_mean["humidity"], row=1, col=2)
-    fig.add_bar(x=env_mean["학교"], y=env_mean["ph"], row=2, col=1)
+    x_schools = np.asarray(env_mean["학교"])
+    for metric, (r, c) in zip(["temperature", "humidity", "ph"], [(1, 1), (1, 2), (2, 1)]):
+        fig.add_bar(x=x_schools, y=env_mean[metric].to_numpy(dtype="float32"), row=r, col=c)
 
     fig.add_bar(
         x=list(EC_INFO.keys()),
-        y=list(EC_INFO.values()),
+        y=np.array(list(EC_INFO.values()), dtype="float32"),
         name="목표 EC",
         row=2, col=2
     )
     fig.add_bar(
-        x=env_mean["학교"],
-        y=env_mean["ec"],
+        x=x_schools,
+        y=env_mean["ec"].to_numpy(dtype="float32"),
         name="실측 EC",
         row=2, col=2
     )
 
-    fig.update_layout(height=700, font=PLOTLY_FONT)
     st.plotly_chart(fig, use_container_width=True)
 
     st.subheader("환경 데이터 시계열")
 
     if selected_school != "전체":
-        df = env_data[selected_school]
+        df = env_timeseries(selected_school)
 
-        fig_ts = make_subplots(rows=3, cols=1, shared_xaxes=True,
-                               subplot_titles=("온도 변화", "습도 변화", "EC 변화"))
+        fig_ts = go.Figure(env_ts_fig_template())
 
-        fig_ts.add_scatter(x=df["time"], y=df["temperature"], row=1, col=1)
-        fig_ts.add_scatter(x=df["time"], y=df["humidity"], row=2, col=1)
-        fig_ts.add_scatter(x=df["time"], y=df["ec"], row=3, col=1)
+        t = df["time"].to_numpy()
+        fig_ts.add_scattergl(x=t, y=df["temperature"].to_numpy(dtype="float32"), mode="lines", row=1, col=1)
+        fig_ts.add_scattergl(x=t, y=df["humidity"].to_numpy(dtype="float32"), mode="lines", row=2, col=1)
+        fig_ts.add_scattergl(x=t, y=df["ec"].to_numpy(dtype="float32"), mode="lines", row=3, col=1)
 
         fig_ts.add_hline(y=EC_INFO[selected_school], row=3, col=1)
 
-        fig_ts.update_layout(height=700, font=PLOTLY_FONT)
         st.plotly_chart(fig_ts, use_container_width=True)
 
     with st.expander("📥 환경 데이터 원본"):
         st.dataframe(env_all, use_container_width=True)
-        buffer = io.BytesIO()
-        env_all.to_csv(buffer, index=False)
-        buffer.seek(0)
         st.download_button(
             "CSV 다운로드",
-            data=buffer,
+            data=env_csv_bytes(),
             file_name="환경데이터_전체.csv",
             mime="text/csv"
         )
@@ -215,50 +409,43 @@ with tab2:
 # Tab 3: 생육 결과
 # =========================================================
 with tab3:
-    growth_all = pd.concat(growth_data.values())
-
     st.subheader("🥇 EC별 평균 생중량")
-    mean_weight = growth_all.groupby("EC")["생중량(g)"].mean().reset_index()
-    best_ec = mean_weight.loc[mean_weight["생중량(g)"].idxmax(), "EC"]
+    ec_means = ec_metric_means()
+    best_ec = ec_means["생중량"].idxmax()
 
     c1, c2, c3, c4 = st.columns(4)
-    for col, (_, row) in zip([c1, c2, c3, c4], mean_weight.iterrows()):
-        label = f"EC {row['EC']}"
-        if row["EC"] == best_ec:
+    for col, (ec, weight) in zip([c1, c2, c3, c4], ec_means["생중량"].items()):
+        label = f"EC {ec}"
+        if ec == best_ec:
             label += " ⭐"
-        col.metric(label, f"{row['생중량(g)']:.2f} g")
+        col.metric(label, f"{weight:.2f} g")
 
     st.subheader("EC별 생육 비교")
 
-    metrics = {
-        "평균 생중량": "생중량(g)",
-        "평균 잎 수": "잎 수(장)",
-        "평균 지상부 길이": "지상부 길이(mm)",
-        "개체수": None
-    }
-
-    fig2 = make_subplots(rows=2, cols=2, subplot_titles=list(metrics.keys()))
+    fig2 = go.Figure(ec_metric_fig_template())
 
     i = 0
-    for title, col_name in metrics.items():
+    for title, col_name in EC_METRIC_PANELS.items():
         r, c = divmod(i, 2)
-        if col_name:
-            y = growth_all.groupby("EC")[col_name].mean()
-        else:
-            y = growth_all.groupby("EC").size()
-        fig2.add_bar(x=y.index, y=y.values, row=r+1, col=c+1)
+        y = ec_means[col_name]
+        fig2.add_bar(x=y.index.to_numpy(), y=y.to_numpy(dtype="float32"), row=r+1, col=c+1)
         i += 1
 
-    fig2.update_layout(height=700, font=PLOTLY_FONT)
     st.plotly_chart(fig2, use_container_width=True)
 
     st.subheader("학교별 생중량 분포")
-    fig_box = px.box(
-        growth_all,
-        x="학교",
-        y="생중량(g)",
-        color="학교"
-    )
+    q = school_weight_quantiles()
+    fig_box = go.Figure()
+    for school, row in q.iterrows():
+        fig_box.add_box(
+            name=school,
+            x=[school],
+            q1=[row[0.25]],
+            median=[row[0.5]],
+            q3=[row[0.75]],
+            lowerfence=[row[0.0]],
+            upperfence=[row[1.0]]
+        )
     fig_box.update_layout(font=PLOTLY_FONT)
     st.plotly_chart(fig_box, use_container_width=True)
 
@@ -269,7 +456,8 @@ with tab3:
         growth_all,
         x="잎 수(장)",
         y="생중량(g)",
-        color="학교"
+        color="학교",
+        render_mode="webgl"
     )
     fig_sc1.update_layout(font=PLOTLY_FONT)
     c1.plotly_chart(fig_sc1, use_container_width=True)
@@ -278,18 +466,17 @@ with tab3:
         growth_all,
         x="지상부 길이(mm)",
         y="생중량(g)",
-        color="학교"
+        color="학교",
+        render_mode="webgl"
     )
     fig_sc2.update_layout(font=PLOTLY_FONT)
     c2.plotly_chart(fig_sc2, use_container_width=True)
 
     with st.expander("📥 생육 데이터 원본"):
         st.dataframe(growth_all, use_container_width=True)
-        buffer = io.BytesIO()
-        growth_all.to_excel(buffer, index=False, engine="openpyxl")
-        buffer.seek(0)
         st.download_button(
             "XLSX 다운로드",
-            data=buffer,
+            data=growth_xlsx_bytes(),
             file_name="생육결과_전체.xlsx",
-            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet
+            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+        )